@@ -0,0 +1,198 @@
+"""Move advice for many games hosted by the same process, evaluated in batches.
+
+Every game session asks "where should this card go on this board?" on it's own. Instead of
+answering each question separately, `BatchAdvisor` collects the questions of every session for a
+short while and scores all the possible placements of all of them with a few array operations,
+using the potential tables built from `max_points_of_row`.
+
+Example:
+with BatchAdvisor(max_batch=256, max_wait=0.002) as advisor:
+    advice = advisor.evaluate(board, 7)  # Can be called from many threads at once.
+    print(advice["best"])
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+import numpy as np
+
+from jospel import EMPTY_TILE, ROW_INDICES
+from potential import (EMPTY, SIGNATURE_COUNT, board_values, deck_signature, get_tables,
+                       remaining_deck)
+
+
+def prepare_request(board, card, signature=None) -> tuple:
+    """Checks a request and turns it into the form used by `evaluate_batch`.
+    `board` is a 16-length list which can include empty tiles, `card` is the card to place and
+    `signature` the signature of the remaining deck, which is calculated from the cards on the board
+    and the card itself if None.
+
+    Returns a tuple (tiles, card, signature), where `tiles` has `EMPTY` for the empty tiles.
+    Raises ValueError if the request can't happen in a game.
+    """
+    if len(board) != 16:
+        raise ValueError("Board must have 16 tiles, got {}".format(len(board)))
+    tiles = [EMPTY if tile in (EMPTY_TILE, None, EMPTY) else tile for tile in board]
+    for value in tiles + [card]:
+        if not isinstance(value, (int, np.integer)) or not EMPTY <= value <= 10:
+            raise ValueError("Invalid card {!r}".format(value))
+    tiles, card = [int(x) for x in tiles], int(card)
+    if card == EMPTY:
+        raise ValueError("Invalid card {!r}".format(card))
+    seen_cards = [x for x in tiles if x != EMPTY] + [card]
+    if any(seen_cards.count(x) > 2 for x in seen_cards):
+        raise ValueError("A card is used more than twice")
+    if signature is None:
+        signature = deck_signature(remaining_deck(seen_cards))
+    elif not 0 <= signature < SIGNATURE_COUNT:
+        raise ValueError("Invalid deck signature {}".format(signature))
+    return (tiles, card, signature)
+
+def evaluate_batch(requests, tables=None, row_indices=ROW_INDICES) -> list:
+    """Evaluates every placement of a list of requests at once.
+    Every request is a tuple (board, card, signature), as given to `prepare_request`.
+
+    Returns a dict for every request, with "values", a dict of every empty tile index to the
+    estimated points of the board when the card is placed there, and "best", the index with the
+    highest estimate. A full board gets no values and None as the best.
+
+    Raises ValueError if any of the requests is invalid.
+    """
+    return _evaluate_prepared([prepare_request(*request) for request in requests], tables,
+                              row_indices)
+
+def _evaluate_prepared(requests, tables, row_indices) -> list:
+    "Same as `evaluate_batch`, for requests which already went through `prepare_request`"
+    candidates = []
+    signatures = []
+    owners = []  # Which request and tile every candidate board belongs to.
+    for number, (tiles, card, signature) in enumerate(requests):
+        for i, tile in enumerate(tiles):
+            if tile == EMPTY:
+                candidate = list(tiles)
+                candidate[i] = card
+                candidates.append(candidate)
+                signatures.append(signature)
+                owners.append((number, i))
+
+    advice = [{"values": {}, "best": None} for _ in requests]
+    if candidates:
+        values = board_values(np.array(candidates, dtype=np.int64), signatures, tables,
+                              row_indices)
+        for (number, i), value in zip(owners, values.tolist()):
+            advice[number]["values"][i] = value
+    for result in advice:
+        if result["values"]:
+            result["best"] = max(result["values"], key=result["values"].get)
+    return advice
+
+
+def _resolve(future, result=None, exception=None) -> None:
+    """Sets the result or exception of Future `future`, ignoring futures that are already done, so
+    a single caller can never stop the background thread of `BatchAdvisor`."""
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class BatchAdvisor:
+    """Collects evaluation requests from many threads and evaluates them together.
+
+    A background thread waits for the first request, then keeps collecting more until there are
+    `max_batch` of them or `max_wait` seconds have passed since the first one, and evaluates them as
+    one batch with `evaluate_batch`. Under load the batches fill up quickly, and when it's quiet a
+    single request waits at most `max_wait` seconds longer than it would on it's own.
+    """
+
+    def __init__(self, max_batch=256, max_wait=0.002, tables=None, row_indices=ROW_INDICES):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.tables = get_tables() if tables is None else tables
+        self.row_indices = row_indices
+        self.requests = queue.Queue()
+        self.closed = False
+        self.closing_lock = threading.Lock()  # So nothing is queued after the last batch.
+        self.batches = 0
+        self.evaluated = 0
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, board, card, signature=None) -> Future:
+        """Asks for the evaluation of placing int `card` on 16-length list `board`, see
+        `evaluate_batch`. Asyncio code can wait for the result with `asyncio.wrap_future`.
+        The request is checked right away, so an invalid one only fails it's own Future and never
+        the other requests of the same batch.
+
+        Returns a Future which will hold the advice dict, or the ValueError of an invalid request.
+        Raises RuntimeError if the advisor is already closed.
+        """
+        future = Future()
+        try:
+            request = prepare_request(list(board), card, signature)
+        except ValueError as err:
+            future.set_exception(err)
+            return future
+        with self.closing_lock:
+            if self.closed:
+                raise RuntimeError("BatchAdvisor is closed")
+            self.requests.put(request + (future,))
+        return future
+
+    def evaluate(self, board, card, signature=None) -> dict:
+        "Same as `submit`, but waits for the advice and returns it"
+        return self.submit(board, card, signature).result()
+
+    def close(self) -> None:
+        "Evaluates the requests that are still waiting and stops the background thread"
+        with self.closing_lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.requests.put(None)
+        self.worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _run(self) -> None:
+        "Loop of the background thread, collecting and evaluating batches until closed"
+        closing = False
+        while not closing:
+            batch = [self.requests.get()]
+            if batch[0] is None:
+                return
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    request = self.requests.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    closing = True
+                    break
+                batch.append(request)
+            # Requests whose caller already gave up are left out, and the rest can't be cancelled
+            # any more from here on.
+            batch = [request for request in batch if request[3].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = _evaluate_prepared([request[:3] for request in batch], self.tables,
+                                             self.row_indices)
+            except Exception as err: # pylint: disable=broad-except
+                for request in batch:
+                    _resolve(request[3], exception=err)
+                continue
+            self.batches += 1
+            self.evaluated += len(batch)
+            for request, result in zip(batch, results):
+                _resolve(request[3], result=result)
@@ -0,0 +1,189 @@
+"""Scoring large amounts of finished boards from the command line.
+
+Boards are streamed from files or stdin in chunks, so the memory use doesn't depend on how many
+boards there are. Every board is 16 cards from 1 to 10, row by row, in one of these formats:
+- csv: a line of 16 comma separated numbers, a first line that isn't numbers is skipped as a header
+- jsonl: a line with a list of 16 numbers, or an object with the list under "board"
+- binary: 16 bytes per board, one byte per card
+
+For every board the pattern and points of every line and the total are written to stdout, as csv or
+JSON lines. The amount of boards scored per second is reported to stderr at the end.
+
+Example:
+python bulk_score.py boards.csv --lines 10 --output jsonl > scores.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+
+import numpy as np
+
+from jospel import DIAGONAL_ROW_INDICES, ROW_INDICES, max_points_of_row
+from potential import full_line_points, line_id
+
+
+PATTERN_NAMES = ["", "pair", "double pair", "short streak", "long streak", "Jospel",
+                 "pair + streak"]
+RULE_VARIANTS = {8: ROW_INDICES, 10: DIAGONAL_ROW_INDICES}
+INVALID_BOARD = "Every board must be 16 cards from 1 to 10, {} {}"
+
+
+def line_pattern_table():
+    """Runs `max_points_of_row` on every possible line once.
+
+    Returns a tuple (patterns, points) of arrays indexed by `line_id`. `patterns` holds the index of
+    the pattern's name in `PATTERN_NAMES` (0 for no pattern) and `points` holds it's points.
+    """
+    patterns = np.zeros(11 ** 4, dtype=np.uint8)
+    for row in itertools.product(range(1, 11), repeat=4):
+        result = max_points_of_row(list(row))
+        if result is not None:
+            patterns[line_id(row)] = PATTERN_NAMES.index(result[1])
+    # `full_line_points` is indexed by the tiles, the first tile being the first axis, while the
+    # first tile is the lowest digit of a line id.
+    points = full_line_points().ravel(order="F").astype(np.int64)
+    return patterns, points
+
+def score_boards(boards, table, row_indices=ROW_INDICES):
+    """Scores every board of (N, 16) int array `boards` with `table` from `line_pattern_table`.
+
+    Returns a tuple (patterns, points, totals), where `patterns` and `points` are
+    (N, len(row_indices)) arrays and `totals` is an N-length array.
+    """
+    line_ids = boards[:, np.asarray(row_indices)] @ (11 ** np.arange(4))
+    patterns, points = table[0][line_ids], table[1][line_ids]
+    return patterns, points, points.sum(axis=1)
+
+def parse_board(line, input_format) -> list:
+    """Parses a single csv or jsonl line into a board.
+
+    Returns a 16-length int list, or None if the line isn't a valid board.
+    """
+    if input_format == "csv":
+        try:
+            board = [int(x) for x in line.split(",")]
+        except ValueError:
+            return None
+    else:
+        try:
+            board = json.loads(line)
+        except ValueError:
+            return None
+        if isinstance(board, dict):
+            board = board.get("board")
+        # JSON numbers like 3.5 or true would otherwise be turned into cards.
+        if not isinstance(board, list) or \
+           any(type(x) is not int for x in board):  # pylint: disable=unidiomatic-typecheck
+            return None
+    if len(board) != 16 or any(not 1 <= x <= 10 for x in board):
+        return None
+    return board
+
+def read_text_chunks(stream, input_format, chunk_size):
+    """Yields (N, 16) int arrays of at most `chunk_size` boards from a csv or jsonl text stream.
+
+    Raises ValueError with the line number if a line isn't a valid board.
+    """
+    first = True
+    boards = []
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        if first and input_format == "csv" and not line.split(",")[0].strip().isdigit():
+            first = False
+            continue  # Header line.
+        first = False
+        board = parse_board(line, input_format)
+        if board is None:
+            raise ValueError(INVALID_BOARD.format("on line", number))
+        boards.append(board)
+        if len(boards) == chunk_size:
+            yield np.array(boards, dtype=np.int64)
+            boards = []
+    if boards:
+        yield np.array(boards, dtype=np.int64)
+
+def read_binary_chunks(stream, chunk_size):
+    """Yields (N, 16) int arrays of at most `chunk_size` boards from a binary stream.
+
+    Raises ValueError with the board number if a board isn't valid.
+    """
+    boards_read = 0
+    while True:
+        data = stream.read(chunk_size * 16)
+        if not data:
+            return
+        if len(data) % 16:
+            raise ValueError("Binary input ends in the middle of board {}".format(
+                boards_read + len(data) // 16 + 1))
+        boards = np.frombuffer(data, dtype=np.uint8).reshape(-1, 16).astype(np.int64)
+        invalid = np.flatnonzero(((boards < 1) | (boards > 10)).any(axis=1))
+        if len(invalid):
+            raise ValueError(INVALID_BOARD.format("board", boards_read + invalid[0] + 1))
+        boards_read += len(boards)
+        yield boards
+
+def write_results(output, output_format, patterns, points, totals) -> None:
+    "Writes the scores of a chunk of boards to text stream `output` in csv or jsonl"
+    names = np.array(PATTERN_NAMES, dtype=object)[patterns]
+    if output_format == "csv":
+        output.write("".join(
+            ",".join(itertools.chain(row_names, map(str, row_points), (str(total),))) + "\n"
+            for row_names, row_points, total in zip(names.tolist(), points.tolist(),
+                                                    totals.tolist())))
+    else:
+        output.write("".join(
+            json.dumps({"patterns": [x or None for x in row_names],
+                        "points": row_points,
+                        "total": total}) + "\n"
+            for row_names, row_points, total in zip(names.tolist(), points.tolist(),
+                                                    totals.tolist())))
+
+def main():
+    "Command line interface"
+    parser = argparse.ArgumentParser(description="Score finished Jospel boards in bulk.")
+    parser.add_argument("files", nargs="*", default=["-"], help="input files, - for stdin")
+    parser.add_argument("--input", choices=["csv", "jsonl", "binary"],
+                        help="input format, guessed from the file extension if not given")
+    parser.add_argument("--output", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--lines", type=int, choices=sorted(RULE_VARIANTS), default=8,
+                        help="8 for rows and columns, 10 to also score the diagonals")
+    parser.add_argument("--chunk-size", type=int, default=65536)
+    arguments = parser.parse_args()
+
+    row_indices = RULE_VARIANTS[arguments.lines]
+    table = line_pattern_table()
+    if arguments.output == "csv":
+        print(",".join(["pattern{}".format(i + 1) for i in range(len(row_indices))]
+                       + ["points{}".format(i + 1) for i in range(len(row_indices))]
+                       + ["total"]))
+    boards_scored = 0
+    started = time.time()
+    for path in arguments.files:
+        input_format = arguments.input
+        if input_format is None:
+            input_format = {"csv": "csv", "jsonl": "jsonl", "json": "jsonl"}.get(
+                path.rsplit(".", 1)[-1], "binary" if path != "-" else "csv")
+        if input_format == "binary":
+            stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+            chunks = read_binary_chunks(stream, arguments.chunk_size)
+        else:
+            stream = sys.stdin if path == "-" else open(path)
+            chunks = read_text_chunks(stream, input_format, arguments.chunk_size)
+        with stream:
+            try:
+                for boards in chunks:
+                    write_results(sys.stdout, arguments.output,
+                                  *score_boards(boards, table, row_indices))
+                    boards_scored += len(boards)
+            except ValueError as err:
+                parser.exit(1, "{}: {}: {}\n".format(parser.prog, path, err))
+    elapsed = time.time() - started
+    print("Scored {} boards in {:.2f}s ({:.0f} rows/sec)".format(
+        boards_scored, elapsed, boards_scored / elapsed if elapsed else 0.0), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
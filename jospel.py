@@ -5,6 +5,8 @@ Learn more about this game at https://github.com/ZetDude/jospel/blob/master/READ
 import random
 from numpy import base_repr
 
+from render import render_board, render_board_with_bonuses
+
 
 CARD_POOL = [val for val in list(range(1, 11)) for _ in (0, 1)]
 COLUMN_FACTORS = {"A": 0,
@@ -13,6 +15,19 @@ COLUMN_FACTORS = {"A": 0,
                   "D": 3,
                  }
 EMPTY_TILE = "[]"
+ROW_INDICES = [[0, 1, 2, 3],     #  0  1  2  3
+               [4, 5, 6, 7],     #  4  5  6  7
+               [8, 9, 10, 11],   #  8  9 10 11
+               [12, 13, 14, 15], # 12 13 14 15
+               [0, 4, 8, 12],
+               [1, 5, 9, 13],    # This list has all the rows and columns
+               [2, 6, 10, 14],   # that the system should check for patterns.
+               [3, 7, 11, 15],
+              ]
+# The rule variant from diagonals.py, which also scores both diagonals.
+DIAGONAL_ROW_INDICES = ROW_INDICES + [[0, 5, 10, 15],
+                                      [3, 6, 9, 12],
+                                     ]
 
 def all_sublists_from_list(given_list, sublist_size) -> list:
     """Get all sublists of given length `sublist_size` from longer list
@@ -257,15 +272,8 @@ def display_board(board) -> None:
     An invalid input list, which doesn't match the criteria of 16-length int list
     isn't handled and may cause unforseeable consequences.
     """
-    print(" X │ A  B  C  D ")  # Hard-coded column headers
-    print("───┼────────────")
-    for i in range(0, 16, 4):  # Iterate through every beginning of a row, as rows are 4 tiles wide
-        # Formatting magic. It works.
-        print(" {} │".format((i+4)//4), end=" ")
-        for j in range(4):
-            current_tile = str(board[i + j])
-            print((" " if len(current_tile) == 1 else "") + current_tile, end=" ")
-        print()
+    # The whole board is built as one string by render.py and written at once.
+    print(render_board(board), end="")
 
 def display_board_with_bonuses(board, points) -> None:
     """Prints out the 16-length int list `board`, formatted neatly for readability
@@ -280,29 +288,8 @@ def display_board_with_bonuses(board, points) -> None:
     Invalid input lists, which don't match the aformentioned criteria aren't handled and
     may cause unforseeable consequences.
     """
-    print(" X │ A  B  C  D  │")  # Hard-coded column headers
-    print("───┼─────────────┤")
-    # I'm sorry if you need to do anything with this part. This deals with formatting and is a mess,
-    # it works and I don't recommend you touch it.
-    # here be dragons.
-    for i in range(0, 16, 4):
-        row_number = i//4
-        row_points = points[row_number]
-        print(" {} │".format(row_number + 1), end=" ")
-        for j in range(4):
-            current_tile = str(board[i + j])
-            print((" " if len(current_tile) == 1 else "") + current_tile, end=" ")
-        if row_points is not None:
-            print("│ ← {} ({})".format(row_points[1], row_points[0]))
-        else:
-            print("│")
-    print("───┴─────────────┘")
-    for j in range(4):
-        row_points = points[4 + j]
-        space_amount = 6 + 3 * j
-        if row_points is not None:
-            print("{}↑ {} ({})".format(space_amount * " ", row_points[1], row_points[0]))
-    # dragons are gone.
+    # The whole report is built as one string by render.py and written at once.
+    print(render_board_with_bonuses(board, points), end="")
 
 def location_to_index(loc) -> int:
     """Converts the column-row notation string `loc` given by the user when playing into a list
@@ -324,6 +311,31 @@ def location_to_index(loc) -> int:
     # handled outside the function.
     return COLUMN_FACTORS[loc[0]] + (int(loc[1]) * 4 - 4)
 
+def score_board(board, row_indices=ROW_INDICES) -> list:
+    """Finds the max points of every row and column of the filled 16-length int list `board`.
+    `row_indices` picks which lines are scored, `ROW_INDICES` for the standard 8 lines or
+    `DIAGONAL_ROW_INDICES` for the 10 lines of diagonals.py.
+
+    Returns a list with the result of `max_points_of_row` for every line, in the order of
+    `row_indices`.
+
+    An invalid input list, which doesn't match the criteria of a filled 16-length int list
+    isn't handled and may cause unforseeable consequences.
+    """
+    # This part of the code turns all rows and columns into lists, for dealing with later.
+    total_rows = []
+    for row in row_indices:
+        current_row = []
+        for i in row:
+            current_row.append(int(board[i]))
+        total_rows.append(current_row)
+
+    # This part of the code finds the max points of every row and column into a seperate list.
+    results = []
+    for i in total_rows:
+        results.append(max_points_of_row(i))
+    return results
+
 # Here's the main game logic!
 def main():
     "Call to run the game once!"
@@ -347,13 +359,16 @@ def main():
         played_cards = list(current_card_pool)
 
     turns_taken = 0
+    # Whitespace after every turn for better formatting, written out together with the next frame.
+    clear = ""
     while current_card_pool:  # While there are still cards in the pool.
         if turns_taken == 16:
-            print("Game has lasted too long, forcing end.")
+            print(clear + "Game has lasted too long, forcing end.")
             return
         # Pop the top card. As the list is shuffled this is random anyway.
         chosen_number = current_card_pool.pop()
-        display_board(board)
+        # The same text as `display_board`, with the whitespace in front of it.
+        print(clear + render_board(board), end="")
         got_target = False  # bool denoting if a position for the number has been chosen.
         while not got_target:
             try:
@@ -369,33 +384,12 @@ def main():
                     print("Position filled, try again")
         board[target] = chosen_number  # Update the board with the number
         turns_taken += 1
-        print("\n" * 20)  # Print some whitespace for better formatting.
-
-    row_indices = [[0, 1, 2, 3],     #  0  1  2  3
-                   [4, 5, 6, 7],     #  4  5  6  7
-                   [8, 9, 10, 11],   #  8  9 10 11
-                   [12, 13, 14, 15], # 12 13 14 15
-                   [0, 4, 8, 12],
-                   [1, 5, 9, 13],    # This list has all the rows and columns
-                   [2, 6, 10, 14],   # that the system should check for patterns.
-                   [3, 7, 11, 15],
-                  ]
+        clear = "\n" * 21
 
-    # This part of the code turns all rows and columns into lists, for dealing with later.
-    total_rows = []
-    for row in row_indices:
-        current_row = []
-        for i in row:
-            current_row.append(int(board[i]))
-        total_rows.append(current_row)
-
-    # This part of the code finds the max points of every row and column into a seperate list.
-    results = []
-    for i in total_rows:
-        results.append(max_points_of_row(i))
+    results = score_board(board)
 
     # Nice messages for the user
-    print("\n\n\nG A M E   O V E R !\n\n")
+    print(clear + "\n\n\nG A M E   O V E R !\n\n")
     display_board_with_bonuses(board, results)
     # Removes all the rows that gave no points
     results = [x[0] for x in results if x is not None]
@@ -405,8 +399,9 @@ def main():
     input("Enter to continue...")
 
 # Play the game forever...
-while True:
-    main()
+if __name__ == "__main__":
+    while True:
+        main()
 
 ####################################################################################################
 ######### The following code is still a work in progress, and doesn't even work. Don't try #########
@@ -0,0 +1,246 @@
+"""Precomputed tables of what a partially filled line of Jospel can still become.
+
+A line with some tiles filled has a maximum amount of points it can still reach, and that depends
+on which cards are still left in the deck. Finding it by trying every completion and calling
+`max_points_of_row` is far too slow for heuristic players and search, so these tables are built
+once and then give the answer with a couple of array lookups.
+
+Lines are indexed by `line_id`, where every tile is either empty or a card from 1 to 10.
+The remaining deck is indexed by `deck_signature`, which stores how many copies (0, 1 or 2) of
+every card value are still left. As every card exists twice in `CARD_POOL`, this describes the
+remaining deck exactly.
+"""
+
+import itertools
+
+import numpy as np
+
+from jospel import CARD_POOL, EMPTY_TILE, ROW_INDICES, max_points_of_row
+
+
+EMPTY = 0  # Value used for an empty tile inside line ids.
+LINE_COUNT = 11 ** 4  # Every tile of a line is empty or a card from 1 to 10.
+SIGNATURE_COUNT = 3 ** 10  # Every card value is left 0, 1 or 2 times.
+PROBABILITY_SCALE = 255  # Probabilities are stored as integers from 0 to this.
+FULL_DECK_SIGNATURE = SIGNATURE_COUNT - 1
+
+
+def line_id(line) -> int:
+    """Converts 4-length list `line` into it's index in the potential tables.
+    Tiles can be ints from 1 to 10, or empty, which can be given as `EMPTY_TILE`, `EMPTY` or None.
+
+    Example:
+    [3, "[]", "[]", 4] -> 3 + 0 * 11 + 0 * 121 + 4 * 1331 = 5327
+    """
+    identifier = 0
+    for i in reversed(line):
+        identifier = identifier * 11 + (EMPTY if i in (EMPTY_TILE, None) else int(i))
+    return identifier
+
+def deck_signature(remaining_cards) -> int:
+    """Converts int list `remaining_cards` into the compact signature used by the potential tables.
+    The signature is a base 3 number, where the digit for card value `v` is the amount of copies of
+    `v` left in the deck. Copies beyond the two found in `CARD_POOL` are ignored.
+
+    Example:
+    [1, 1, 3] -> 2 * 1 + 1 * 9 = 11
+    """
+    counts = [0] * 10
+    for card in remaining_cards:
+        counts[card - 1] = min(counts[card - 1] + 1, 2)
+    signature = 0
+    for count in reversed(counts):
+        signature = signature * 3 + count
+    return signature
+
+def signature_counts() -> np.ndarray:
+    """Returns a (SIGNATURE_COUNT, 10) array, where row `s` holds the amount of copies of every card
+    value left in the deck with signature `s`."""
+    signatures = np.arange(SIGNATURE_COUNT)
+    return np.stack([(signatures // 3 ** v) % 3 for v in range(10)], axis=1).astype(np.int64)
+
+def full_line_points() -> np.ndarray:
+    """Returns an (11, 11, 11, 11) array with the points from `max_points_of_row` of every filled
+    line, indexed by it's tiles. Lines with empty tiles are left at 0."""
+    points = np.zeros((11, 11, 11, 11), dtype=np.uint8)
+    for row in itertools.product(range(1, 11), repeat=4):
+        result = max_points_of_row(list(row))
+        points[row] = result[0] if result is not None else 0
+    return points
+
+
+class PotentialTables:
+    """Best achievable points and completion probabilities of every partial line.
+
+    Many lines behave the same way, so the tables are stored as a list of unique profiles, every
+    one of which has a value for every deck signature, and `profile_of_line` tells which profile
+    a line uses. A lookup is then `best[profile_of_line[line], signature]`.
+
+    `best` holds the most points the line could still reach by completing it with cards from the
+    remaining deck. `probability` holds the chance, out of `PROBABILITY_SCALE`, that filling the
+    empty tiles with random cards drawn from the remaining deck reaches those best points.
+    """
+
+    def __init__(self, profile_of_line, best, probability):
+        self.profile_of_line = profile_of_line
+        self.best = best
+        self.probability = probability
+
+    def best_points(self, line, signature) -> int:
+        """Returns the most points 4-length list `line` could still earn when completed with cards
+        of the deck with signature int `signature`. Returns 0 if the deck can't complete it."""
+        return int(self.best[self.profile_of_line[line_id(line)], signature])
+
+    def completion_probability(self, line, signature) -> float:
+        """Returns the chance that completing 4-length list `line` with random cards of the deck with
+        signature int `signature` reaches the points given by `best_points`."""
+        profile = self.profile_of_line[line_id(line)]
+        return float(self.probability[profile, signature]) / PROBABILITY_SCALE
+
+    def save(self, path) -> None:
+        "Saves the tables into the file at str `path` in numpy's .npz format"
+        with open(path, "wb") as tables_file:
+            np.savez(tables_file, profile_of_line=self.profile_of_line, best=self.best,
+                     probability=self.probability)
+
+    @classmethod
+    def load(cls, path):
+        "Loads tables saved with `save` from the file at str `path`"
+        with np.load(path) as data:
+            return cls(data["profile_of_line"], data["best"], data["probability"])
+
+    @classmethod
+    def build(cls):
+        """Calculates the tables from scratch.
+
+        Every line is first reduced to how many ways each multiset of filler cards gives each
+        amount of points. Lines with the same reduction share a profile, so only a few hundred
+        profiles are actually calculated.
+        """
+        full_points = full_line_points()
+        counts = signature_counts()
+        # falling[m][c] is the amount of ways to draw m specific cards out of c copies in order.
+        falling = np.array([[1, 1, 1], [0, 1, 2], [0, 0, 2]], dtype=np.float32)
+
+        profile_keys = {}
+        profile_of_line = np.zeros(LINE_COUNT, dtype=np.uint16)
+        for line in itertools.product(range(11), repeat=4):
+            empties = [i for i, tile in enumerate(line) if tile == EMPTY]
+            ways = {}  # (points, filler multiset signature) -> amount of orderings
+            for filler in itertools.product(range(1, 11), repeat=len(empties)):
+                if any(filler.count(card) > 2 for card in filler):
+                    continue  # Can't ever be drawn, every card only exists twice.
+                row = list(line)
+                for i, card in zip(empties, filler):
+                    row[i] = card
+                key = (int(full_points[tuple(row)]), deck_signature(filler))
+                ways[key] = ways.get(key, 0) + 1
+            key = (len(empties), frozenset(ways.items()))
+            profile_of_line[line_id(line)] = profile_keys.setdefault(key, len(profile_keys))
+
+        profiles = list(profile_keys)
+        # The best points of every filler multiset, then spread so every deck gets the best of all
+        # the multisets it contains, by taking the running max along every card value.
+        reachable = np.full((len(profiles), SIGNATURE_COUNT), -1, dtype=np.int8)
+        for profile, (_, ways) in enumerate(profiles):
+            for (points, needed), _ in ways:
+                reachable[profile, needed] = max(reachable[profile, needed], points)
+        for card in range(10):
+            # View the signatures so that the digit of `card` gets it's own axis.
+            digits = reachable.reshape(len(profiles), 3 ** (9 - card), 3, 3 ** card)
+            np.maximum(digits[:, :, 0], digits[:, :, 1], out=digits[:, :, 1])
+            np.maximum(digits[:, :, 1], digits[:, :, 2], out=digits[:, :, 2])
+        best = np.maximum(reachable, 0).astype(np.uint8)
+
+        # The chance of reaching the best points is the amount of orderings which reach them,
+        # weighted by how likely each filler multiset is to be drawn. Profiles with the same amount
+        # of empty tiles share the same multisets, so they are handled together as one matrix
+        # product per chunk of deck signatures.
+        probability = np.zeros((len(profiles), SIGNATURE_COUNT), dtype=np.uint8)
+        deck_sizes = counts.sum(axis=1)
+        for empty_count in range(5):
+            group = [i for i, (k, _) in enumerate(profiles) if k == empty_count]
+            multisets = np.nonzero(deck_sizes == empty_count)[0]
+            column_of_multiset = {needed: i for i, needed in enumerate(multisets)}
+            orderings = np.zeros((len(group), 5, len(multisets)), dtype=np.float32)
+            for row, profile in enumerate(group):
+                for (points, needed), amount in profiles[profile][1]:
+                    if points > 0:
+                        orderings[row, points // 10 - 1, column_of_multiset[needed]] = amount
+            orderings = orderings.reshape(len(group) * 5, len(multisets))
+            for chunk in range(0, SIGNATURE_COUNT, 4096):
+                chunk_counts = counts[chunk:chunk + 4096]
+                # weight[m, s] is the amount of ways to draw multiset m, in a given order, from s.
+                weight = np.ones((len(multisets), len(chunk_counts)), dtype=np.float32)
+                for card in range(10):
+                    weight *= falling[counts[multisets, card]][:, chunk_counts[:, card]]
+                draws = np.ones(len(chunk_counts), dtype=np.float32)
+                for i in range(empty_count):
+                    draws *= np.maximum(deck_sizes[chunk:chunk + 4096] - i, 0)
+                hits = (orderings @ weight).reshape(len(group), 5, len(chunk_counts))
+                chunk_reachable = reachable[group, chunk:chunk + 4096]
+                level = np.clip(chunk_reachable // 10 - 1, 0, 4)
+                hits = np.take_along_axis(hits, level[:, None, :], axis=1)[:, 0, :]
+                chance = np.divide(hits, draws, out=np.zeros_like(hits), where=draws > 0)
+                # A line that can't score at all reaches it's best of 0 with any completion.
+                chance[chunk_reachable == 0] = 1.0
+                chance[chunk_reachable < 0] = 0.0
+                probability[group, chunk:chunk + 4096] = np.rint(chance * PROBABILITY_SCALE)
+        return cls(profile_of_line, best, probability)
+
+
+_DEFAULT_TABLES = None
+
+def get_tables(cache_path=None) -> PotentialTables:
+    """Returns the potential tables, building them on the first call of the process.
+    If str `cache_path` is given, the tables are loaded from that file if it exists and saved into
+    it after building otherwise, so later processes can start up without building them again.
+    """
+    global _DEFAULT_TABLES  # pylint: disable=global-statement
+    if _DEFAULT_TABLES is None:
+        try:
+            if cache_path is None:
+                raise FileNotFoundError
+            _DEFAULT_TABLES = PotentialTables.load(cache_path)
+        except FileNotFoundError:
+            _DEFAULT_TABLES = PotentialTables.build()
+            if cache_path is not None:
+                _DEFAULT_TABLES.save(cache_path)
+    return _DEFAULT_TABLES
+
+def board_value(board, signature, tables=None, row_indices=ROW_INDICES) -> float:
+    """Estimates the points the 16-length list `board`, which can include empty tiles, will end up
+    with when the rest of the cards come from the deck with signature int `signature`.
+    Every line counts for it's best achievable points times the chance of reaching them, which
+    treats every line as if it was filled on it's own, so it's a heuristic and not an exact
+    expected value.
+    """
+    tables = get_tables() if tables is None else tables
+    value = 0
+    for row in row_indices:
+        profile = tables.profile_of_line[line_id([board[i] for i in row])]
+        value += int(tables.best[profile, signature]) * int(tables.probability[profile, signature])
+    return value / PROBABILITY_SCALE
+
+def board_values(boards, signatures, tables=None, row_indices=ROW_INDICES) -> np.ndarray:
+    """Calculates `board_value` of many boards at once.
+    `boards` is an (N, 16) int array, where empty tiles are `EMPTY`, and `signatures` is an N-length
+    int array with the remaining deck signature of every board.
+
+    Returns an N-length float array of the estimated points of every board.
+    """
+    tables = get_tables() if tables is None else tables
+    # Every line of every board as a line id, by weighing the tiles of the line by powers of 11.
+    line_ids = boards[:, np.asarray(row_indices)].astype(np.int64) @ (11 ** np.arange(4))
+    profiles = tables.profile_of_line[line_ids]
+    signatures = np.asarray(signatures)[:, None]
+    points = tables.best[profiles, signatures].astype(np.int64)
+    chances = tables.probability[profiles, signatures]
+    return (points * chances).sum(axis=1) / PROBABILITY_SCALE
+
+def remaining_deck(seen_cards) -> list:
+    "Returns the cards of `CARD_POOL` which aren't in int list `seen_cards`, as a list"
+    remaining = list(CARD_POOL)
+    for card in seen_cards:
+        remaining.remove(card)
+    return remaining
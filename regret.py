@@ -0,0 +1,192 @@
+"""Post-game analysis of every move of a played Jospel game.
+
+For every card placed, the estimated value of the board with the card on the chosen tile is
+compared to the best tile that was free at the time, using only what the player knew then: the
+board so far and the cards already shown. The difference is the regret of that move.
+
+Games are given as a seed and the 16 tiles the cards were placed on, in the order they were
+played. Archives of many games can be analysed on a process pool, where every worker keeps a cache
+of evaluated positions that is shared by all the games it analyses, or all the workers share a
+single `SharedTranspositionTable`.
+
+Run as a script to analyse a JSON lines archive, every line being an object like
+{"seed": "2LTBSUK5PAT", "placements": ["A1", "B3", ...]}, printing a JSON line per game.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+
+from jospel import (COLUMN_FACTORS, EMPTY_TILE, decode_seed, detect_faulty_seed,
+                    location_to_index, score_board)
+from potential import board_value, deck_signature, get_tables, remaining_deck
+from transposition import SharedTranspositionTable
+
+
+CACHE_LIMIT = 1000000  # The cache is emptied when it grows beyond this many positions.
+_POSITION_CACHE = {}
+_SHARED_TABLE = None  # Used instead of the cache of this process when set by `use_shared_table`.
+
+
+def index_to_location(index) -> str:
+    """Converts a board list index into the column-row notation used when playing, the opposite
+    of `location_to_index`.
+
+    Example:
+    9 -> B3
+    """
+    columns = {factor: column for column, factor in COLUMN_FACTORS.items()}
+    return "{}{}".format(columns[index % 4], index // 4 + 1)
+
+def use_shared_table(table) -> None:
+    """Makes this process cache positions in SharedTranspositionTable `table`, or in it's own
+    cache again if `table` is None. Meant to be used as a pool initializer."""
+    global _SHARED_TABLE  # pylint: disable=global-statement
+    _SHARED_TABLE = table
+
+def position_value(board, signature) -> float:
+    """Returns the `board_value` of 16-length list `board` with the remaining deck signature int
+    `signature`, using the position cache of this process or the shared table."""
+    if _SHARED_TABLE is not None:
+        entry = _SHARED_TABLE.probe(board, signature)
+        if entry is not None:
+            return entry[0]
+        value = board_value(board, signature, get_tables())
+        _SHARED_TABLE.store(board, signature, value)
+        return value
+    key = (tuple(board), signature)
+    value = _POSITION_CACHE.get(key)
+    if value is None:
+        if len(_POSITION_CACHE) >= CACHE_LIMIT:
+            _POSITION_CACHE.clear()
+        value = board_value(board, signature, get_tables())
+        _POSITION_CACHE[key] = value
+    return value
+
+def placement_to_index(placement) -> int:
+    """Converts a placement, a board list index from 0 to 15 or a str in column-row notation, into
+    a board list index.
+
+    Raises ValueError if the placement isn't a tile of the board.
+    """
+    if isinstance(placement, int) and not isinstance(placement, bool):
+        if not 0 <= placement < 16:
+            raise ValueError("Invalid placement {}".format(placement))
+        return placement
+    if not isinstance(placement, str) or len(placement) != 2:
+        raise ValueError("Invalid placement {!r}".format(placement))
+    try:
+        return location_to_index(placement.upper())
+    # All the errors that can arise from location_to_index() when the input is invalid.
+    except (IndexError, KeyError, ValueError):
+        raise ValueError("Invalid placement {!r}".format(placement)) from None
+
+def analyse_game(seed, placements) -> dict:
+    """Analyses the game played with str `seed`, where the cards were placed on the tiles of
+    list `placements` in order. Tiles can be given as board list indices or in column-row notation.
+
+    Returns a dict with the seed, the final score, the total regret and a list of moves, where
+    every move has the card, the chosen and the best tile, their estimated values and the regret.
+
+    Raises ValueError if the seed is faulty or the placements don't fit the game.
+    """
+    fault = detect_faulty_seed(seed)
+    if fault:
+        raise ValueError(fault)
+    # Cards are popped from the end of the decoded seed when playing.
+    cards = list(reversed(decode_seed(seed)))
+    if len(placements) != len(cards):
+        raise ValueError("Expected {} placements, got {}".format(len(cards), len(placements)))
+
+    board = [EMPTY_TILE] * 16
+    seen_cards = []
+    moves = []
+    for card, placement in zip(cards, placements):
+        target = placement_to_index(placement)
+        if board[target] != EMPTY_TILE:
+            raise ValueError("Tile {} is placed on twice".format(index_to_location(target)))
+        seen_cards.append(card)
+        signature = deck_signature(remaining_deck(seen_cards))
+        values = {}
+        for i, tile in enumerate(board):
+            if tile == EMPTY_TILE:
+                board[i] = card
+                values[i] = position_value(board, signature)
+                board[i] = EMPTY_TILE
+        best = max(values, key=values.get)
+        board[target] = card
+        moves.append({"card": card,
+                      "chosen": index_to_location(target),
+                      "best": index_to_location(best),
+                      "chosen_value": values[target],
+                      "best_value": values[best],
+                      "regret": values[best] - values[target],
+                     })
+
+    results = [x[0] for x in score_board(board) if x is not None]
+    return {"seed": seed,
+            "score": sum(results),
+            "total_regret": sum(move["regret"] for move in moves),
+            "moves": moves,
+           }
+
+def analyse_record(line) -> dict:
+    """Analyses a single JSON line of an archive, meant to be run inside of a worker process.
+    Games that can't be analysed, including lines that aren't valid records, are returned with an
+    "error" instead of the analysis, so a single bad line doesn't stop the whole archive."""
+    record = None
+    try:
+        record = json.loads(line)
+        return analyse_game(record["seed"], record["placements"])
+    except (ValueError, IndexError, KeyError, TypeError, AttributeError) as err:
+        seed = record.get("seed") if isinstance(record, dict) else None
+        return {"seed": seed, "error": "{}: {}".format(type(err).__name__, err)}
+
+def analyse_archive(lines, workers=None, chunk_size=64, table=None):
+    """Analyses every game of the JSON lines iterable `lines` on a process pool of `workers`
+    processes. Games are handed to the workers `chunk_size` at a time, so every worker can reuse
+    it's position cache for many games. If SharedTranspositionTable `table` is given, every worker
+    uses it instead of it's own cache.
+
+    Yields the analysis of every game, in the same order as the archive.
+    """
+    get_tables()  # Build the tables once, so forked workers don't all have to.
+    with multiprocessing.Pool(workers, use_shared_table, (table,)) as pool:
+        yield from pool.imap(analyse_record, (x for x in lines if x.strip()), chunk_size)
+
+def main():
+    "Command line interface, printing a JSON line per game and a summary at the end"
+    parser = argparse.ArgumentParser(description="Analyse the regret of played Jospel games.")
+    parser.add_argument("archive", nargs="?", help="JSON lines file of games, stdin if not given")
+    parser.add_argument("--workers", type=int, help="amount of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--shared-cache-mb", type=int,
+                        help="share a position cache of this size between all workers")
+    arguments = parser.parse_args()
+
+    table = None
+    if arguments.shared_cache_mb:
+        table = SharedTranspositionTable(arguments.shared_cache_mb * 2 ** 20, "always")
+    archive = open(arguments.archive) if arguments.archive else sys.stdin
+    games = 0
+    total_regret = 0.0
+    try:
+        with archive:
+            for analysis in analyse_archive(archive, arguments.workers, arguments.chunk_size,
+                                            table):
+                print(json.dumps(analysis))
+                if "error" not in analysis:
+                    games += 1
+                    total_regret += analysis["total_regret"]
+    finally:
+        if table is not None:
+            print("Shared cache: {}".format(table.stats()), file=sys.stderr)
+            table.close()
+            table.unlink()
+    if games:
+        print("Analysed {} games, mean regret {:.2f}".format(games, total_regret / games),
+              file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
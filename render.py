@@ -0,0 +1,77 @@
+"""Rendering boards and score reports into strings.
+
+Builds the exact same text as printed by `display_board` and `display_board_with_bonuses` in
+jospel.py, but as a single string per frame, so it can be written out in one go. The text of every
+card is prepared once, and many boards can be rendered with one call for reports.
+
+This module doesn't import jospel.py, as jospel.py uses it for it's own output.
+"""
+
+BOARD_HEADER = " X │ A  B  C  D \n───┼────────────\n"
+BONUS_HEADER = " X │ A  B  C  D  │\n"
+BONUS_DIVIDER = "───┼─────────────┤"
+BONUS_FOOTER = "───┴─────────────┘"
+ROW_PREFIXES = [" {} │ ".format(i + 1) for i in range(4)]
+COLUMN_PREFIXES = [(6 + 3 * j) * " " + "↑ " for j in range(4)]
+# The text of every tile, the number right aligned to 2 characters and a space after it.
+TILE_TEMPLATES = {value: "{:>2} ".format(value) for value in range(1, 11)}
+
+
+def _tile(tile) -> str:
+    """Returns the text of a single tile, from `TILE_TEMPLATES` for the cards and formatted on the
+    spot for anything else, like empty tiles, without adding it to the table"""
+    # Only exact ints are looked up, as True and 1.0 are equal to 1 and would get it's text.
+    if type(tile) is int:  # pylint: disable=unidiomatic-typecheck
+        text = TILE_TEMPLATES.get(tile)
+        if text is not None:
+            return text
+    text = str(tile)
+    return (" " if len(text) == 1 else "") + text + " "
+
+def _bonus(points) -> str:
+    "Returns the text of the tuple (points, name) of a line, as shown after the arrows"
+    return "{} ({})".format(points[1], points[0])
+
+def render_board(board) -> str:
+    """Returns the text `display_board` prints for the 16-length list `board`, including the final
+    newline."""
+    parts = [BOARD_HEADER]
+    for row in range(4):
+        parts.append(ROW_PREFIXES[row])
+        parts.extend(_tile(tile) for tile in board[row * 4:row * 4 + 4])
+        parts.append("\n")
+    return "".join(parts)
+
+def render_board_with_bonuses(board, points) -> str:
+    """Returns the text `display_board_with_bonuses` prints for the 16-length list `board` and the
+    results of every line in list `points`, including the final newline.
+
+    `points` has the results of the 4 rows and then the 4 columns, as given by `score_board`. If it
+    also has the results of the two diagonals, as with `DIAGONAL_ROW_INDICES`, they are shown like
+    diagonals.py does.
+    """
+    parts = [BONUS_HEADER, BONUS_DIVIDER]
+    if len(points) > 9 and points[9] is not None:
+        parts.append(" ↙ " + _bonus(points[9]))
+    parts.append("\n")
+    for row in range(4):
+        parts.append(ROW_PREFIXES[row])
+        parts.extend(_tile(tile) for tile in board[row * 4:row * 4 + 4])
+        parts.append("│ ← " + _bonus(points[row]) + "\n" if points[row] is not None else "│\n")
+    parts.append(BONUS_FOOTER)
+    if len(points) > 8 and points[8] is not None:
+        parts.append(" ↖ " + _bonus(points[8]))
+    parts.append("\n")
+    for column in range(4):
+        if points[4 + column] is not None:
+            parts.append(COLUMN_PREFIXES[column] + _bonus(points[4 + column]) + "\n")
+    return "".join(parts)
+
+def render_boards(boards, separator="\n") -> str:
+    "Renders every board of iterable `boards` with `render_board`, joined by str `separator`"
+    return separator.join(render_board(board) for board in boards)
+
+def render_reports(games, separator="\n") -> str:
+    """Renders every (board, points) tuple of iterable `games` with `render_board_with_bonuses`,
+    joined by str `separator`."""
+    return separator.join(render_board_with_bonuses(board, points) for board, points in games)
@@ -0,0 +1,235 @@
+"""Searching for deals with interesting properties, to publish as challenge seeds.
+
+Every possible deal, the 16 cards of a game in the order of `encode_seed`, has an index from 0 to
+`DEAL_COUNT`. Small index ranges can be scanned completely, otherwise the deal space is sampled
+randomly. Either way the work is split into chunks that are checked on a process pool, and the
+progress is saved into a checkpoint file after every chunk so long searches can be resumed.
+
+Deals whose first card is a 10 can't be written as a seed, as `encode_seed` turns the 10 into a
+leading zero which is lost, so they are left out of the deal space.
+"""
+
+import argparse
+import functools
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+
+from jospel import ROW_INDICES, encode_seed, max_points_of_row
+
+
+DEAL_LENGTH = 16
+
+
+@functools.lru_cache(maxsize=None)
+def count_deals(length, twos, ones) -> int:
+    """Counts the different int lists of length `length` that can be dealt from a deck with `twos`
+    card values left twice and `ones` card values left once."""
+    if length == 0:
+        return 1
+    total = 0
+    if twos:
+        total += twos * count_deals(length - 1, twos - 1, ones + 1)
+    if ones:
+        total += ones * count_deals(length - 1, twos, ones - 1)
+    return total
+
+# Every deal that doesn't start with a 10, which is 9 out of every 10 deals.
+DEAL_COUNT = count_deals(DEAL_LENGTH, 10, 0) * 9 // 10
+
+def deal_from_index(index) -> list:
+    """Converts int `index`, from 0 to `DEAL_COUNT`, into the deal with that index.
+    Deals are numbered in lexicographical order.
+
+    Raises IndexError if the index is out of range.
+    """
+    if not 0 <= index < DEAL_COUNT:
+        raise IndexError
+    copies_left = [2] * 10
+    deal = []
+    for position in range(DEAL_LENGTH):
+        for card in range(1, 11):
+            if copies_left[card - 1] == 0 or (position == 0 and card == 10):
+                continue
+            copies_left[card - 1] -= 1
+            # The amount of deals that start with the cards picked so far.
+            following = count_deals(DEAL_LENGTH - position - 1,
+                                    copies_left.count(2), copies_left.count(1))
+            if index < following:
+                deal.append(card)
+                break
+            index -= following
+            copies_left[card - 1] += 1
+    return deal
+
+def jospel_reachable(deal) -> bool:
+    """Checks if int list `deal` includes all the cards needed for a Jospel.
+    There are only two 1s and two 10s, so a Jospel needs every one of them.
+    """
+    return deal.count(1) == 2 and deal.count(10) == 2
+
+@functools.lru_cache(maxsize=None)
+def quadruple_points() -> dict:
+    """Returns a dict of every sorted 4-length tuple of cards to the most points `max_points_of_row`
+    gives for any order of those cards. Built on the first call of the process."""
+    points = {}
+    for row in itertools.product(range(1, 11), repeat=4):
+        result = max_points_of_row(list(row))
+        key = tuple(sorted(row))
+        points[key] = max(points.get(key, 0), result[0] if result is not None else 0)
+    return points
+
+@functools.lru_cache(maxsize=None)
+def best_partition(cards) -> int:
+    """Finds the most points that sorted int tuple `cards`, with a length divisible by 4, can earn
+    when split into lines of 4 cards, each line scored in it's best order.
+
+    Example:
+    (1, 1, 2, 3, 4, 5, 10, 10) -> 90, as (1, 1, 10, 10) is a Jospel and (2, 3, 4, 5) a long streak
+    """
+    if not cards:
+        return 0
+    # The first card has to be in some line, so only the lines with it need to be tried.
+    first, rest = cards[0], cards[1:]
+    best = 0
+    for others in set(itertools.combinations(rest, 3)):
+        remaining = list(rest)
+        for card in others:
+            remaining.remove(card)
+        best = max(best, quadruple_points()[(first,) + others] + best_partition(tuple(remaining)))
+    return best
+
+def upper_bound(deal, row_indices=ROW_INDICES) -> int:
+    """Returns an upper bound of the points any board made from int list `deal` can earn with the
+    lines of `row_indices`, whose first 8 lines must be the rows and the columns.
+
+    The rows split the 16 cards into 4 lines and so do the columns, so each of them can earn at most
+    `best_partition` of the deal. Any further lines, like the diagonals, are counted as the best
+    single line that can be made from the deal.
+    """
+    cards = tuple(sorted(deal))
+    bound = 2 * best_partition(cards)
+    if len(row_indices) > 8:
+        best_line = max(quadruple_points()[x] for x in set(itertools.combinations(cards, 4)))
+        bound += (len(row_indices) - 8) * best_line
+    return bound
+
+def upper_bound_at_least(points, deal) -> bool:
+    "Checks if the `upper_bound` of int list `deal` is at least int `points`"
+    return upper_bound(deal) >= points
+
+def check_chunk(task) -> list:
+    """Runs the checks of a single chunk, meant to be run inside of a worker process.
+    `task` is a tuple (indices, checks), where `indices` is an iterable of deal indices and `checks`
+    is a list of predicates which all need to return True for a deal to match.
+
+    Returns the seeds of the matching deals.
+    """
+    indices, checks = task
+    matches = []
+    for index in indices:
+        deal = deal_from_index(index)
+        if all(check(deal) for check in checks):
+            matches.append(encode_seed(deal))
+    return matches
+
+def chunk_indices(chunk, chunk_size, start, stop, samples, random_seed):
+    """Returns the deal indices of chunk number `chunk`.
+    When `samples` is None, the chunks cover the range from `start` to `stop`. Otherwise every chunk
+    is `chunk_size` random indices, which only depend on `random_seed` and the chunk number so
+    a resumed search draws exactly the same deals.
+    """
+    if samples is None:
+        first = start + chunk * chunk_size
+        return range(first, min(first + chunk_size, stop))
+    generator = random.Random("{}:{}".format(random_seed, chunk))
+    amount = min(chunk_size, samples - chunk * chunk_size)
+    return [generator.randrange(DEAL_COUNT) for _ in range(amount)]
+
+def search(predicate, filters=(), start=0, stop=None, samples=None, random_seed=0,
+           chunk_size=10000, workers=None, checkpoint_path=None):
+    """Looks for deals where every one of `filters` and then `predicate` returns True.
+    Every check is given the deal as an int list. Cheap checks should be put into `filters`, as
+    they are run first and `predicate` only sees the deals that pass them. Checks are run in worker
+    processes, so they need to be picklable, for example module level functions or
+    `functools.partial` objects of them.
+
+    Scans the deal indices from `start` to `stop` (`DEAL_COUNT` if not given), or if int `samples`
+    is given, checks that many randomly sampled deals instead, based on `random_seed`.
+
+    If str `checkpoint_path` is given, the progress is saved into that file after every chunk, and
+    a search started with the same arguments continues from where it was left off.
+
+    Yields the seeds of the matching deals, in the format of `encode_seed`.
+    """
+    stop = DEAL_COUNT if stop is None else stop
+    total = samples if samples is not None else max(stop - start, 0)
+    chunk_count = -(-total // chunk_size)
+    settings = {"start": start,
+                "stop": stop,
+                "samples": samples,
+                "random_seed": random_seed,
+                "chunk_size": chunk_size,
+               }
+    progress = {"settings": settings, "next_chunk": 0, "found": 0}
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as checkpoint_file:
+            progress = json.load(checkpoint_file)
+        if progress["settings"] != settings:
+            raise ValueError("Checkpoint {} belongs to a different search".format(checkpoint_path))
+
+    checks = list(filters) + [predicate]
+    tasks = ((chunk_indices(chunk, chunk_size, start, stop, samples, random_seed), checks)
+             for chunk in range(progress["next_chunk"], chunk_count))
+    with multiprocessing.Pool(workers) as pool:
+        # imap keeps the chunks in order, so everything before `next_chunk` is always done.
+        for matches in pool.imap(check_chunk, tasks):
+            yield from matches
+            progress["next_chunk"] += 1
+            progress["found"] += len(matches)
+            if checkpoint_path is not None:
+                with open(checkpoint_path + ".tmp", "w") as checkpoint_file:
+                    json.dump(progress, checkpoint_file)
+                os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+def main():
+    "Command line interface, printing the matching seeds one per line"
+    parser = argparse.ArgumentParser(description="Search for Jospel deals with given properties.")
+    parser.add_argument("--jospel", action="store_true",
+                        help="only deals where a Jospel can be made")
+    parser.add_argument("--min-upper-bound", type=int, default=0,
+                        help="only deals whose upper bound of points is at least this")
+    parser.add_argument("--predicate",
+                        help="module:function called with every deal that passes the filters, "
+                             "for example my_checks:unique_optimum")
+    parser.add_argument("--start", type=int, default=0, help="first deal index to scan")
+    parser.add_argument("--stop", type=int, help="deal index to stop scanning at")
+    parser.add_argument("--samples", type=int, help="sample this many random deals instead")
+    parser.add_argument("--random-seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, help="amount of worker processes")
+    parser.add_argument("--checkpoint", help="file to save the progress into")
+    arguments = parser.parse_args()
+
+    filters = [jospel_reachable] if arguments.jospel else []
+    if arguments.min_upper_bound:
+        filters.append(functools.partial(upper_bound_at_least, arguments.min_upper_bound))
+    if arguments.predicate:
+        module_name, _, function_name = arguments.predicate.partition(":")
+        if not function_name:
+            parser.error("--predicate must look like module:function")
+        predicate = getattr(importlib.import_module(module_name), function_name)
+    else:
+        predicate = bool  # Every deal that passes the filters.
+    for seed in search(predicate, filters, arguments.start, arguments.stop, arguments.samples,
+                       arguments.random_seed, arguments.chunk_size, arguments.workers,
+                       arguments.checkpoint):
+        print(seed)
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""Streaming statistics for long Jospel simulations.
+Every accumulator here uses a fixed amount of memory no matter how many games are added, can be
+merged with another accumulator of the same kind (so every worker can aggregate on it's own and
+the results are combined at the end), and can be turned into a JSON friendly dict for saving
+snapshots to disk, so that long runs can be resumed."""
+
+import json
+import math
+import os
+
+from jospel import ROW_INDICES, score_board
+
+
+class CountAccumulator:
+    """Counts how many times every str key has been seen.
+    Memory is bounded by the amount of distinct keys, which for pattern names is tiny.
+    Merging is exact."""
+
+    def __init__(self):
+        self.counts = {}
+
+    def add(self, key, amount=1) -> None:
+        "Counts str `key` `amount` more times"
+        self.counts[key] = self.counts.get(key, 0) + amount
+
+    def merge(self, other) -> None:
+        "Adds all the counts of CountAccumulator `other` to this one"
+        for key, amount in other.counts.items():
+            self.add(key, amount)
+
+    def total(self) -> int:
+        "Returns the sum of all counts"
+        return sum(self.counts.values())
+
+    def to_dict(self) -> dict:
+        "Returns a JSON friendly representation of this accumulator"
+        return {"counts": dict(self.counts)}
+
+    @classmethod
+    def from_dict(cls, data):
+        "Creates a CountAccumulator from the output of `to_dict`"
+        accumulator = cls()
+        accumulator.counts = dict(data["counts"])
+        return accumulator
+
+
+class Histogram:
+    """Counts int or float values into `bin_count` bins of width `bin_width`, starting from `low`.
+    Values outside of the bins are counted as underflow or overflow.
+    Merging is exact, but only between histograms with the same bin layout, otherwise ValueError
+    is raised.
+
+    Example:
+    Histogram(0, 10, 41) has a bin for every possible Jospel score of the standard 8 lines,
+    0, 10, 20 ... 400.
+    """
+
+    def __init__(self, low, bin_width, bin_count):
+        self.low = low
+        self.bin_width = bin_width
+        self.bins = [0] * bin_count
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, value, amount=1) -> None:
+        "Counts `value` `amount` more times"
+        position = math.floor((value - self.low) / self.bin_width)
+        if position < 0:
+            self.underflow += amount
+        elif position >= len(self.bins):
+            self.overflow += amount
+        else:
+            self.bins[position] += amount
+
+    def merge(self, other) -> None:
+        "Adds all the counts of Histogram `other` to this one"
+        if (self.low, self.bin_width, len(self.bins)) != \
+           (other.low, other.bin_width, len(other.bins)):
+            raise ValueError("Cannot merge histograms with different bin layouts")
+        for i, amount in enumerate(other.bins):
+            self.bins[i] += amount
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+
+    def total(self) -> int:
+        "Returns the amount of values counted, including underflow and overflow"
+        return sum(self.bins) + self.underflow + self.overflow
+
+    def quantile(self, fraction):
+        """Finds the approximate value below which float `fraction` (0 to 1) of the values lie.
+
+        Returns the lower edge of the bin the quantile falls into, so the error is at most one bin
+        width. Returns None if nothing was counted. Underflow and overflow values are treated as
+        lying on the edges of the histogram.
+        """
+        total = self.total()
+        if total == 0:
+            return None
+        target = fraction * total
+        seen = self.underflow
+        if seen > target:
+            return self.low
+        for i, amount in enumerate(self.bins):
+            seen += amount
+            if seen > target:
+                return self.low + i * self.bin_width
+        return self.low + len(self.bins) * self.bin_width
+
+    def to_dict(self) -> dict:
+        "Returns a JSON friendly representation of this histogram"
+        return {"low": self.low,
+                "bin_width": self.bin_width,
+                "bins": list(self.bins),
+                "underflow": self.underflow,
+                "overflow": self.overflow,
+               }
+
+    @classmethod
+    def from_dict(cls, data):
+        "Creates a Histogram from the output of `to_dict`"
+        histogram = cls(data["low"], data["bin_width"], len(data["bins"]))
+        histogram.bins = list(data["bins"])
+        histogram.underflow = data["underflow"]
+        histogram.overflow = data["overflow"]
+        return histogram
+
+
+class RunningMoments:
+    """Keeps the count, mean, variance, min and max of a stream of numbers.
+    Uses Welford's method for adding and Chan's method for merging, so merging is exact (up to
+    float rounding) and doesn't lose precision over billions of values like summing squares would.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared differences from the mean.
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value) -> None:
+        "Adds number `value` to the stream"
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def merge(self, other) -> None:
+        "Combines RunningMoments `other` into this one"
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.minimum, self.maximum = other.minimum, other.maximum
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def variance(self) -> float:
+        "Returns the sample variance, 0.0 if there are less than 2 values"
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+    def stddev(self) -> float:
+        "Returns the sample standard deviation"
+        return math.sqrt(self.variance())
+
+    def to_dict(self) -> dict:
+        "Returns a JSON friendly representation of these moments"
+        return {"count": self.count,
+                "mean": self.mean,
+                "m2": self.m2,
+                "minimum": self.minimum,
+                "maximum": self.maximum,
+               }
+
+    @classmethod
+    def from_dict(cls, data):
+        "Creates RunningMoments from the output of `to_dict`"
+        moments = cls()
+        moments.count = data["count"]
+        moments.mean = data["mean"]
+        moments.m2 = data["m2"]
+        moments.minimum = data["minimum"]
+        moments.maximum = data["maximum"]
+        return moments
+
+
+class QuantileSketch:
+    """Estimates quantiles of a stream of non-negative numbers with a relative error of at most
+    float `accuracy`, using logarithmically sized buckets (the same idea as DDSketch).
+
+    Memory is capped at `max_buckets` buckets; once there are more, the smallest buckets are
+    collapsed together, which only hurts the accuracy of the lowest quantiles. Merging is exact,
+    as the bucket counts are simply added together, so merging sketches gives the same result as
+    adding every value to a single sketch.
+    """
+
+    def __init__(self, accuracy=0.01, max_buckets=2048):
+        self.accuracy = accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.zero_count = 0  # Zero can't be put in a logarithmic bucket, so it's counted apart.
+        self.buckets = {}
+
+    def add(self, value, amount=1) -> None:
+        "Counts non-negative number `value` `amount` more times"
+        if value < 0:
+            raise ValueError("QuantileSketch only accepts non-negative values")
+        if value == 0:
+            self.zero_count += amount
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + amount
+        self._collapse()
+
+    def merge(self, other) -> None:
+        "Adds all the counts of QuantileSketch `other` to this one"
+        if self.accuracy != other.accuracy:
+            raise ValueError("Cannot merge sketches with different accuracies")
+        self.zero_count += other.zero_count
+        for key, amount in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + amount
+        self._collapse()
+
+    def _collapse(self) -> None:
+        "Folds the smallest buckets into each other until there are at most `max_buckets`"
+        while len(self.buckets) > self.max_buckets:
+            smallest, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(smallest)
+
+    def total(self) -> int:
+        "Returns the amount of values counted"
+        return self.zero_count + sum(self.buckets.values())
+
+    def quantile(self, fraction):
+        """Finds the approximate value below which float `fraction` (0 to 1) of the values lie.
+
+        Returns None if nothing was counted.
+        """
+        total = self.total()
+        if total == 0:
+            return None
+        target = fraction * (total - 1)
+        seen = self.zero_count
+        if seen > target:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > target:
+                # The middle of the bucket, which is within `accuracy` of every value in it.
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self) -> dict:
+        "Returns a JSON friendly representation of this sketch"
+        return {"accuracy": self.accuracy,
+                "max_buckets": self.max_buckets,
+                "zero_count": self.zero_count,
+                # JSON only allows str keys.
+                "buckets": {str(key): amount for key, amount in self.buckets.items()},
+               }
+
+    @classmethod
+    def from_dict(cls, data):
+        "Creates a QuantileSketch from the output of `to_dict`"
+        sketch = cls(data["accuracy"], data["max_buckets"])
+        sketch.zero_count = data["zero_count"]
+        sketch.buckets = {int(key): amount for key, amount in data["buckets"].items()}
+        return sketch
+
+
+class SimulationStats:
+    """Aggregates the results of many finished games.
+
+    Keeps track of:
+    - `scores`: a histogram of the total scores, with a bin for every multiple of 10
+    - `score_moments` and `score_quantiles`: mean, variance and quantiles of the total scores
+    - `line_patterns`: for every line in `row_indices`, how often each pattern was scored on it
+      (rows that gave no points are counted as "none")
+    - `line_points`: for every line in `row_indices`, the mean and variance of it's points
+    - `position_values`: for every one of the 16 tiles, the mean and variance of the card on it
+    """
+
+    def __init__(self, row_indices=ROW_INDICES):
+        self.row_indices = [list(row) for row in row_indices]
+        self.scores = Histogram(0, 10, 50 * len(self.row_indices) // 10 + 1)
+        self.score_moments = RunningMoments()
+        self.score_quantiles = QuantileSketch()
+        self.line_patterns = [CountAccumulator() for _ in self.row_indices]
+        self.line_points = [RunningMoments() for _ in self.row_indices]
+        self.position_values = [RunningMoments() for _ in range(16)]
+
+    def add_game(self, board, results=None) -> None:
+        """Adds the finished 16-length int list `board` to the statistics.
+        `results` is the output of `score_board` for this board, it's calculated if not given.
+        """
+        if results is None:
+            results = score_board(board, self.row_indices)
+        total = 0
+        for i, result in enumerate(results):
+            points, name = result if result is not None else (0, "none")
+            self.line_patterns[i].add(name)
+            self.line_points[i].add(points)
+            total += points
+        self.scores.add(total)
+        self.score_moments.add(total)
+        self.score_quantiles.add(total)
+        for i, value in enumerate(board):
+            self.position_values[i].add(int(value))
+
+    def merge(self, other) -> None:
+        "Combines SimulationStats `other`, which must track the same lines, into this one"
+        if self.row_indices != other.row_indices:
+            raise ValueError("Cannot merge statistics of different rule variants")
+        self.scores.merge(other.scores)
+        self.score_moments.merge(other.score_moments)
+        self.score_quantiles.merge(other.score_quantiles)
+        for mine, theirs in zip(self.line_patterns, other.line_patterns):
+            mine.merge(theirs)
+        for mine, theirs in zip(self.line_points, other.line_points):
+            mine.merge(theirs)
+        for mine, theirs in zip(self.position_values, other.position_values):
+            mine.merge(theirs)
+
+    def to_dict(self) -> dict:
+        "Returns a JSON friendly representation of these statistics"
+        return {"row_indices": self.row_indices,
+                "scores": self.scores.to_dict(),
+                "score_moments": self.score_moments.to_dict(),
+                "score_quantiles": self.score_quantiles.to_dict(),
+                "line_patterns": [x.to_dict() for x in self.line_patterns],
+                "line_points": [x.to_dict() for x in self.line_points],
+                "position_values": [x.to_dict() for x in self.position_values],
+               }
+
+    @classmethod
+    def from_dict(cls, data):
+        "Creates SimulationStats from the output of `to_dict`"
+        stats = cls(data["row_indices"])
+        stats.scores = Histogram.from_dict(data["scores"])
+        stats.score_moments = RunningMoments.from_dict(data["score_moments"])
+        stats.score_quantiles = QuantileSketch.from_dict(data["score_quantiles"])
+        stats.line_patterns = [CountAccumulator.from_dict(x) for x in data["line_patterns"]]
+        stats.line_points = [RunningMoments.from_dict(x) for x in data["line_points"]]
+        stats.position_values = [RunningMoments.from_dict(x) for x in data["position_values"]]
+        return stats
+
+
+def save_snapshot(accumulator, path) -> None:
+    """Saves any accumulator from this module into the file at str `path` as JSON.
+    The file is written next to the target first and then moved over it, so a run that is killed
+    while saving never leaves a half-written snapshot behind.
+    """
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w") as snapshot_file:
+        json.dump({"type": type(accumulator).__name__,
+                   "data": accumulator.to_dict()}, snapshot_file)
+    os.replace(temporary_path, path)
+
+def load_snapshot(path):
+    "Loads an accumulator saved with `save_snapshot` from the file at str `path`"
+    kinds = {cls.__name__: cls for cls in (CountAccumulator, Histogram, RunningMoments,
+                                           QuantileSketch, SimulationStats)}
+    with open(path) as snapshot_file:
+        snapshot = json.load(snapshot_file)
+    return kinds[snapshot["type"]].from_dict(snapshot["data"])
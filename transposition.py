@@ -0,0 +1,194 @@
+"""A transposition table of evaluated positions, shared by every process of a process pool.
+
+The table lives in `multiprocessing.shared_memory`, so workers read and write the same entries
+without sending anything between processes. It has a fixed amount of slots decided when it's
+created, and every position has exactly one slot it can be stored in. When two positions want the
+same slot, the replacement policy decides which one stays:
+- "always" always keeps the newest entry
+- "depth" keeps the entry that was searched deeper, preferring the newest one on a tie
+
+There are no locks. Every slot is three 64-bit words: the packed board xor'd with the other two,
+the entry data and the score. An entry that is torn by two processes writing at once doesn't check
+out when read and is treated as a miss. Every process counts it's probes, hits and stores in a
+counter row of it's own, claimed the first time it uses the table, so the counters are exact and
+`stats` adds the rows up.
+"""
+
+import multiprocessing
+import os
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from jospel import EMPTY_TILE
+
+
+EXACT = 0  # The stored score is the exact value of the position.
+LOWER = 1  # The value of the position is at least the stored score.
+UPPER = 2  # The value of the position is at most the stored score.
+POLICIES = ("always", "depth")
+HEADER_WORDS = 8  # Slot count, claimed counter rows and room for more.
+COUNTER_ROWS = 1024  # The most processes that can use a single table.
+COUNTER_WORDS = 4  # Probes, hits, stores and overwrites of a single process.
+SLOT_WORDS = 3
+_MASK = (1 << 64) - 1
+
+
+def pack_board(board) -> int:
+    """Packs 16-length list `board` into a 64-bit int, 4 bits per tile, empty tiles being 0.
+
+    Example:
+    [3, "[]", ...] -> 3 + 0 * 16 + ...
+    """
+    packed = 0
+    for tile in reversed(board):
+        packed = (packed << 4) | (0 if tile == EMPTY_TILE else int(tile))
+    return packed
+
+def _pack_data(signature, bound, depth) -> int:
+    "Packs an entry into a 64-bit int, with a bit set so that an empty slot is never valid"
+    return signature | depth << 16 | bound << 24 | 1 << 26
+
+def _slot_of(packed_board, signature, slot_mask) -> int:
+    """Mixes a position into a slot number.
+    Uses the finalizer of splitmix64, where every bit of the input affects every bit of the output,
+    so the low bits used for the slot depend on every tile, not only on the first ones."""
+    mixed = (packed_board + signature * 0x9E3779B97F4A7C15) & _MASK
+    mixed = ((mixed ^ (mixed >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    mixed = ((mixed ^ (mixed >> 27)) * 0x94D049BB133111EB) & _MASK
+    return (mixed ^ (mixed >> 31)) & slot_mask
+
+
+class SharedTranspositionTable:
+    """A fixed size table from positions, a board and a remaining deck signature, to their score.
+
+    Create the table once in the main process with `size_bytes` of memory, rounded down to a power
+    of two amount of 24 byte slots. Passing it to worker processes (for example as an argument of
+    a pool initializer) attaches them to the same memory. The process that created it should call
+    `unlink` once every process is done with it.
+
+    At most `COUNTER_ROWS` different processes can use the same table. When the pool uses a start
+    method other than the default, it's multiprocessing `context` needs to be given here too.
+    """
+
+    def __init__(self, size_bytes=64 * 2 ** 20, policy="depth", name=None, context=None):
+        if policy not in POLICIES:
+            raise ValueError("Unknown replacement policy {}".format(policy))
+        self.policy = policy
+        counter_bytes = COUNTER_ROWS * COUNTER_WORDS * 8
+        if name is None:
+            slot_count = 1 << max((size_bytes // (SLOT_WORDS * 8)).bit_length() - 1, 0)
+            self.memory = shared_memory.SharedMemory(
+                create=True, size=HEADER_WORDS * 8 + counter_bytes + SLOT_WORDS * slot_count * 8)
+            self.header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=self.memory.buf)
+            self.header[:] = 0
+            self.header[0] = slot_count
+            # Only taken to claim a counter row.
+            self.lock = (multiprocessing if context is None else context).Lock()
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=self.memory.buf)
+            slot_count = int(self.header[0])
+            self.lock = None  # Set by `__setstate__`.
+        self.slot_mask = slot_count - 1
+        self.counters = np.ndarray((COUNTER_ROWS, COUNTER_WORDS), dtype=np.uint64,
+                                   buffer=self.memory.buf, offset=HEADER_WORDS * 8)
+        if name is None:
+            self.counters[:] = 0
+        self.slots = np.ndarray((slot_count, SLOT_WORDS), dtype=np.uint64, buffer=self.memory.buf,
+                                offset=HEADER_WORDS * 8 + counter_bytes)
+        self.counter_pid = None  # The process that owns `own_counters`.
+        self.own_counters = None
+
+    def __getstate__(self):
+        return {"name": self.memory.name, "policy": self.policy, "lock": self.lock}
+
+    def __setstate__(self, state):
+        self.__init__(policy=state["policy"], name=state["name"])
+        self.lock = state["lock"]
+
+    def _counters(self):
+        """Returns the counter row of this process, claiming a free one on the first call of every
+        process, including forked ones that got a copy of the table from their parent.
+
+        Raises RuntimeError if every counter row is already claimed.
+        """
+        pid = os.getpid()
+        if self.counter_pid != pid:
+            with self.lock:
+                row = int(self.header[1])
+                if row >= COUNTER_ROWS:
+                    raise RuntimeError("More than {} processes used the table".format(COUNTER_ROWS))
+                self.header[1] = row + 1
+            self.own_counters = self.counters[row]
+            self.counter_pid = pid
+        return self.own_counters
+
+    def probe(self, board, signature):
+        """Looks up 16-length list `board` with remaining deck signature int `signature`.
+
+        Returns a tuple (score, bound, depth) if the position is in the table, None otherwise.
+        """
+        packed_board = pack_board(board)
+        check, data, score_bits = (int(x) for x in
+                                   self.slots[_slot_of(packed_board, signature, self.slot_mask)])
+        counters = self._counters()
+        counters[0] += 1
+        if not data >> 26 or check ^ data ^ score_bits != packed_board or \
+           data & 0xFFFF != signature:
+            return None
+        counters[1] += 1
+        score = struct.unpack("<d", struct.pack("<Q", score_bits))[0]
+        return (score, (data >> 24) & 0b11, (data >> 16) & 0xFF)
+
+    def store(self, board, signature, score, bound=EXACT, depth=0) -> None:
+        """Stores float `score` for 16-length list `board` with remaining deck signature int
+        `signature`. `bound` tells if the score is `EXACT`, a `LOWER` or an `UPPER` bound, and int
+        `depth` (0 to 255) how deep it was searched, which the "depth" policy uses to pick entries.
+
+        Raises ValueError if `bound` or `depth` don't fit into their fields.
+        """
+        if not 0 <= bound <= 3:
+            raise ValueError("Bound must be from 0 to 3, got {}".format(bound))
+        if not 0 <= depth <= 255:
+            raise ValueError("Depth must be from 0 to 255, got {}".format(depth))
+        packed_board = pack_board(board)
+        slot = _slot_of(packed_board, signature, self.slot_mask)
+        old_data = int(self.slots[slot, 1])
+        counters = self._counters()
+        if old_data >> 26:
+            if self.policy == "depth" and (old_data >> 16) & 0xFF > depth:
+                return
+            counters[3] += 1
+        data = _pack_data(signature, bound, depth)
+        score_bits = struct.unpack("<Q", struct.pack("<d", score))[0]
+        self.slots[slot] = (packed_board ^ data ^ score_bits, data, score_bits)
+        counters[2] += 1
+
+    def stats(self) -> dict:
+        """Returns the amount of probes, hits, stores and overwrites so far of every process, and the
+        hit rate"""
+        probes, hits, stores, overwrites = (int(x) for x in
+                                            self.counters[:int(self.header[1])].sum(axis=0))
+        return {"slots": self.slot_mask + 1,
+                "probes": probes,
+                "hits": hits,
+                "hit_rate": hits / probes if probes else 0.0,
+                "stores": stores,
+                "overwrites": overwrites,
+               }
+
+    def clear(self) -> None:
+        "Empties the table and resets the counters"
+        self.slots[:] = 0
+        self.counters[:] = 0
+
+    def close(self) -> None:
+        "Detaches this process from the table"
+        del self.header, self.counters, self.own_counters, self.slots
+        self.memory.close()
+
+    def unlink(self) -> None:
+        "Frees the memory of the table, call once from the process that created it"
+        self.memory.unlink()
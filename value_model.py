@@ -0,0 +1,232 @@
+"""A small learned value function, predicting the final score of a position in constant time.
+
+The model is linear over a handful of features of a position (a board, possibly with empty tiles,
+and the cards not seen yet):
+- for every combination of how many tiles of a line are empty and the best points that line can
+  still reach, how many lines are in that state
+- the best points of every line weighted by the chance of reaching them, as in `board_value`
+- the points already earned by the full lines
+- how many copies of every card value haven't been seen yet
+
+It's trained with least squares on positions from simulated games, and the model file is a small
+.npz file. Run as a script to train a model, or to report how the model's moves compare to an exact
+search on positions near the end of the game:
+
+python value_model.py train model.npz --games 20000
+python value_model.py report model.npz --positions 300
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from jospel import CARD_POOL, EMPTY_TILE, ROW_INDICES, score_board
+from potential import (EMPTY, PROBABILITY_SCALE, board_value, board_values, deck_signature,
+                       get_tables, remaining_deck, signature_counts)
+
+
+FEATURE_NAMES = (["lines with {} empty and {} reachable".format(empties, points)
+                  for empties in range(5) for points in range(0, 60, 10)]
+                 + ["expected line points", "earned points"]
+                 + ["unseen {}s".format(card) for card in range(1, 11)]
+                 + ["bias"])
+_SIGNATURE_COUNTS = None
+
+
+def position_features(boards, signatures, tables=None) -> np.ndarray:
+    """Calculates the features of many positions at once.
+    `boards` is an (N, 16) int array, where empty tiles are `EMPTY`, and `signatures` is an N-length
+    int array with the signature of the unseen cards of every position.
+
+    Returns an (N, len(FEATURE_NAMES)) float array.
+    """
+    global _SIGNATURE_COUNTS  # pylint: disable=global-statement
+    if _SIGNATURE_COUNTS is None:
+        _SIGNATURE_COUNTS = signature_counts()
+    tables = get_tables() if tables is None else tables
+    signatures = np.asarray(signatures)
+    line_tiles = boards[:, np.asarray(ROW_INDICES)]
+    profiles = tables.profile_of_line[line_tiles.astype(np.int64) @ (11 ** np.arange(4))]
+    best = tables.best[profiles, signatures[:, None]].astype(np.int64)
+    chances = tables.probability[profiles, signatures[:, None]]
+    empties = (line_tiles == EMPTY).sum(axis=2)
+
+    features = np.zeros((len(boards), len(FEATURE_NAMES)))
+    # Counting the lines of every (empty tiles, reachable points) state with a one-hot sum.
+    states = np.eye(30)[empties * 6 + best // 10].sum(axis=1)
+    features[:, :30] = states
+    features[:, 30] = (best * chances).sum(axis=1) / PROBABILITY_SCALE
+    features[:, 31] = np.where(empties == 0, best, 0).sum(axis=1)
+    features[:, 32:42] = _SIGNATURE_COUNTS[signatures]
+    features[:, 42] = 1.0
+    return features
+
+
+class ValueModel:
+    "Linear model over `position_features`, with one weight per feature"
+
+    def __init__(self, weights):
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+    def predict(self, boards, signatures, tables=None) -> np.ndarray:
+        "Returns the predicted final score of every position, see `position_features`"
+        return position_features(boards, signatures, tables) @ self.weights
+
+    def save(self, path) -> None:
+        "Saves the model into the file at str `path` in numpy's .npz format"
+        with open(path, "wb") as model_file:
+            np.savez(model_file, weights=self.weights, feature_names=np.array(FEATURE_NAMES))
+
+    @classmethod
+    def load(cls, path):
+        """Loads a model saved with `save` from the file at str `path`.
+        Raises ValueError if the model was saved with different features."""
+        with np.load(path) as data:
+            if list(data["feature_names"]) != FEATURE_NAMES:
+                raise ValueError("Model {} uses different features".format(path))
+            return cls(data["weights"])
+
+    @classmethod
+    def train(cls, features, targets, regularization=1e-3):
+        "Fits the weights to the (N, F) float array `features` and N-length `targets` with ridge"
+        gram = features.T @ features + regularization * len(features) * np.eye(features.shape[1])
+        return cls(np.linalg.solve(gram, features.T @ targets))
+
+
+def simulate_games(game_count, model=None, exploration=0.1, seed=0, tables=None):
+    """Plays `game_count` games at once, placing every card on the tile with the best prediction
+    of ValueModel `model`, or the best `board_values` estimate if no model is given. A random tile
+    is picked instead with the chance of float `exploration`, so the positions are more varied.
+
+    Returns a tuple (boards, signatures, scores), with the position after every move of every game
+    and the final score of that game.
+    """
+    tables = get_tables() if tables is None else tables
+    generator = np.random.default_rng(seed)
+    decks = np.array([generator.permutation(CARD_POOL)[:16] for _ in range(game_count)])
+    boards = np.full((game_count, 16), EMPTY, dtype=np.int64)
+    unseen = np.full((game_count, 10), 2, dtype=np.int64)
+    games = np.arange(game_count)
+    seen_boards, seen_signatures = [], []
+    for turn in range(16):
+        cards = decks[:, turn]
+        unseen[games, cards - 1] -= 1
+        signatures = unseen @ (3 ** np.arange(10))
+        # Every game with the card on every tile, full tiles get a value that is never picked.
+        candidates = np.repeat(boards[:, None, :], 16, axis=1)
+        candidates[:, np.arange(16), np.arange(16)] = cards[:, None]
+        free = boards == EMPTY
+        flat = candidates[free]
+        flat_signatures = np.repeat(signatures, free.sum(axis=1))
+        if model is None:
+            flat_values = board_values(flat, flat_signatures, tables)
+        else:
+            flat_values = model.predict(flat, flat_signatures, tables)
+        values = np.full((game_count, 16), -np.inf)
+        values[free] = flat_values
+        choices = values.argmax(axis=1)
+        # Random free tile for the exploring games.
+        explore = generator.random(game_count) < exploration
+        random_values = np.where(free, generator.random((game_count, 16)), -1.0)
+        choices = np.where(explore, random_values.argmax(axis=1), choices)
+        boards[games, choices] = cards
+        seen_boards.append(boards.copy())
+        seen_signatures.append(signatures)
+
+    line_ids = boards[:, np.asarray(ROW_INDICES)] @ (11 ** np.arange(4))
+    scores = tables.best[tables.profile_of_line[line_ids], 0].astype(np.int64).sum(axis=1)
+    return (np.concatenate(seen_boards), np.concatenate(seen_signatures),
+            np.tile(scores, 16).astype(np.float64))
+
+def exact_value(board, unseen, cache) -> float:
+    """Finds the exact expected final score of 16-length list `board` with the best play, when the
+    remaining cards are drawn at random from int list `unseen`. Every empty tile still gets a card,
+    so this is only feasible with a few empty tiles left."""
+    free = [i for i, tile in enumerate(board) if tile == EMPTY_TILE]
+    if not free:
+        return float(sum(x[0] for x in score_board(board) if x is not None))
+    key = (tuple(board), tuple(sorted(unseen)))
+    if key not in cache:
+        total = 0.0
+        for card in set(unseen):
+            rest = list(unseen)
+            rest.remove(card)
+            total += unseen.count(card) * max(exact_value(board[:i] + [card] + board[i + 1:],
+                                                          rest, cache) for i in free)
+        cache[key] = total / len(unseen)
+    return cache[key]
+
+def report(model, position_count=300, seed=1, tables=None) -> dict:
+    """Compares the moves of ValueModel `model` and of `board_value` to an exact search.
+    The positions are held out from training by using a different random seed, and are taken
+    from the last 2 to 4 moves of a game, where the exact search is feasible.
+
+    Returns a dict with, for both the model and `board_value`, how often the chosen tile is as
+    good as the best one, and the mean amount of points lost compared to the best tile.
+    """
+    tables = get_tables() if tables is None else tables
+    generator = np.random.default_rng(seed)
+    results = {"positions": 0}
+    for name in ("model", "board_value"):
+        results[name] = {"agreement": 0.0, "mean_loss": 0.0}
+    started = time.time()
+    for _ in range(position_count):
+        deck = [int(x) for x in generator.permutation(CARD_POOL)]
+        empty_count = int(generator.integers(2, 5))
+        board = deck[:16 - empty_count] + [EMPTY_TILE] * empty_count
+        board = [board[i] for i in generator.permutation(16)]
+        card = deck[16 - empty_count]
+        unseen = remaining_deck([x for x in board if x != EMPTY_TILE] + [card])
+        signature = deck_signature(unseen)
+        free = [i for i, tile in enumerate(board) if tile == EMPTY_TILE]
+        options = [board[:i] + [card] + board[i + 1:] for i in free]
+
+        cache = {}
+        exact = [exact_value(option, unseen, cache) for option in options]
+        option_array = np.array([[EMPTY if x == EMPTY_TILE else x for x in option]
+                                 for option in options])
+        predictions = model.predict(option_array, [signature] * len(options), tables)
+        estimates = [board_value(option, signature, tables) for option in options]
+        for name, guesses in (("model", predictions), ("board_value", estimates)):
+            loss = max(exact) - exact[int(np.argmax(guesses))]
+            results[name]["agreement"] += loss < 1e-9
+            results[name]["mean_loss"] += loss
+        results["positions"] += 1
+    for name in ("model", "board_value"):
+        for stat in ("agreement", "mean_loss"):
+            results[name][stat] /= max(results["positions"], 1)
+    results["seconds"] = time.time() - started
+    return results
+
+def main():
+    "Command line interface for training and reporting"
+    parser = argparse.ArgumentParser(description="Train and check a Jospel value model.")
+    parser.add_argument("action", choices=["train", "report"])
+    parser.add_argument("model", help="model file to write or read")
+    parser.add_argument("--games", type=int, default=20000, help="games to simulate for training")
+    parser.add_argument("--rounds", type=int, default=2,
+                        help="training rounds, every round after the first plays with the model")
+    parser.add_argument("--positions", type=int, default=300, help="positions to report on")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    if arguments.action == "train":
+        model = None
+        for training_round in range(arguments.rounds):
+            boards, signatures, scores = simulate_games(arguments.games, model,
+                                                        seed=arguments.seed + training_round)
+            model = ValueModel.train(position_features(boards, signatures), scores)
+            print("Round {}: mean score {:.2f}".format(training_round + 1, scores.mean()))
+        model.save(arguments.model)
+    else:
+        model = ValueModel.load(arguments.model)
+        # Held out positions come from seeds the training never used.
+        results = report(model, arguments.positions, arguments.seed + 10 ** 6)
+        print("Positions: {} ({:.1f}s)".format(results["positions"], results["seconds"]))
+        for name in ("model", "board_value"):
+            print("{:12} agrees with exact search {:.1%}, loses {:.3f} points per move".format(
+                name, results[name]["agreement"], results[name]["mean_loss"]))
+
+if __name__ == "__main__":
+    main()